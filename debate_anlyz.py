@@ -1,7 +1,18 @@
+import functools
+import heapq
+import os
+import pickle
 import re
+import tempfile
 import zlib
+from collections import Counter, namedtuple
 
-REGEX_WORDS = re.compile(r"[^a-zA-Z0-9_']+")
+VOWEL_RE = re.compile(r"[aeiou]+")
+SENTENCE_RE = re.compile(r"[\.?:!]+")
+# maps all ASCII characters that can't be part of a word to a space, see `tokenize`.
+WORD_DELIMITER_TABLE = str.maketrans(
+    {c: " " for c in map(chr, range(128)) if not (c.isalnum() or c in "_'")}
+)
 SPEAKER_KEY_TRUMP = "FORMER PRESIDENT DONALD TRUMP"
 SPEAKER_KEY_HARRIS = "VICE PRESIDENT KAMALA HARRIS"
 SPEAKER_KEY_VANCE = "JDV"
@@ -16,16 +27,16 @@ def parse_file_to_speakers(file: str):
     """
     lines = {}
     with open(file, "r", encoding="utf-8") as input:
-        for line in input.readlines():
+        for line in input:
             if line.startswith("#") or line == "":
                 continue
             split = line.split(":", maxsplit=1)
             if len(split) != 2:
                 continue
-            if split[0] not in lines:
-                lines[split[0]] = split[1]
-            else:
-                lines[split[0]] += " " + split[1]
+            lines.setdefault(split[0], []).append(split[1])
+    lines = {
+        speaker: " ".join(speaker_lines) for speaker, speaker_lines in lines.items()
+    }
     # cleanup inconsistent names for the same people
     # lines[SPEAKER_KEY_HARRIS] += " " + lines.pop("VICE PRESIDENT HARRIS", "")
     # lines["LINSEY DAVIS"] += " " + lines.pop("LINDSEY DAVIS", "")
@@ -33,57 +44,168 @@ def parse_file_to_speakers(file: str):
     return lines
 
 
+CMU_DICT_FILE = "cmudict-0.7b"
+CMU_DICT_CACHE_FILE = "cmudict.pickle"
+# bump this whenever the parsing in `init_cmu_dict` changes, so stale caches are ignored.
+CMU_DICT_CACHE_VERSION = 1
 SYLLABLES = {}
 
 
+def load_cmu_dict_cache():
+    """
+    Load the syllable counts cached by `write_cmu_dict_cache`.
+    Returns None if there is no usable cache, i.e. it is missing, older than the dictionary,
+    unreadable or written by another version of `init_cmu_dict`.
+    """
+    if not os.path.exists(CMU_DICT_CACHE_FILE) or os.path.getmtime(
+        CMU_DICT_CACHE_FILE
+    ) < os.path.getmtime(CMU_DICT_FILE):
+        return None
+    try:
+        with open(CMU_DICT_CACHE_FILE, "rb") as cache:
+            payload = pickle.load(cache)
+    except Exception:
+        # a corrupted pickle can raise about anything, and the cache is only an optimization.
+        return None
+    if (
+        not isinstance(payload, dict)
+        or payload.get("version") != CMU_DICT_CACHE_VERSION
+    ):
+        return None
+    return payload.get("syllables")
+
+
+def write_cmu_dict_cache():
+    """
+    Cache the syllable counts in `CMU_DICT_CACHE_FILE`.
+    The cache is written to a temporary file first and then moved into place,
+    so an interrupted run can't leave a partial cache behind.
+    """
+    try:
+        (fd, temp_file) = tempfile.mkstemp(
+            prefix=os.path.basename(CMU_DICT_CACHE_FILE) + ".",
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(CMU_DICT_CACHE_FILE)),
+        )
+    except OSError:
+        # the cache is only an optimization, so the analysis can run without it.
+        return
+    try:
+        with os.fdopen(fd, "wb") as cache:
+            pickle.dump(
+                {"version": CMU_DICT_CACHE_VERSION, "syllables": SYLLABLES},
+                cache,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_file, CMU_DICT_CACHE_FILE)
+    except OSError:
+        pass
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
 def init_cmu_dict():
     """
     Load the CMU dictionary and count the syllables for each word, to use in the analysis later.
+    The syllable counts are cached in `CMU_DICT_CACHE_FILE`, see `load_cmu_dict_cache`.
     """
-    with open("cmudict-0.7b", "r", encoding="cp1252") as cmudict:
-        for line in cmudict.read().splitlines():
-            split = re.split(r"\s+", line, maxsplit=1)
-            if len(split) != 2:
+    cached_syllables = load_cmu_dict_cache()
+    if cached_syllables is not None:
+        SYLLABLES.update(cached_syllables)
+        return
+    with open(CMU_DICT_FILE, "r", encoding="cp1252") as cmudict:
+        for line in cmudict:
+            if line.startswith(";;;"):
+                continue
+            split = line.split(None, 1)
+            # alternative pronunciations like "READ(1)" can never match a word from the transcript,
+            # so only the primary pronunciation is kept.
+            if len(split) != 2 or "(" in split[0]:
                 continue
-            num_syllables = len(
-                [
-                    phoneme
-                    for phoneme in re.split(r"\s+", split[1])
-                    if phoneme != "" and phoneme[-1].isdigit()
-                ]
+            # only vowel phonemes carry a stress marker (0, 1 or 2), so counting those digits
+            # counts the syllables without splitting the pronunciation into phonemes.
+            phonemes = split[1]
+            SYLLABLES[split[0]] = (
+                phonemes.count("0") + phonemes.count("1") + phonemes.count("2")
             )
-            SYLLABLES[split[0]] = num_syllables
+    write_cmu_dict_cache()
 
 
+@functools.lru_cache(maxsize=None)
 def count_syllables(word: str):
     """
     Count the syllables in a word.
     If possible, use the count from the CMU dictionary.
     If not, lazily count the number of vowel groups.
+    Results are cached, so `init_cmu_dict` has to be called before the first call.
     """
-    if word.upper() in SYLLABLES:
-        return SYLLABLES[word.upper()]
+    # the words from `count_words` are already in upper case, so this is only a cheap copy for them.
+    word = word.upper()
+    if word in SYLLABLES:
+        return SYLLABLES[word]
     # lazy approximation: just count the number of vowel groups
     # this would lead to errors for words like "date", but most words should be covered by the CMU dict anyway.
-    return len(re.findall(r"[aeiou]+", word))
+    return len(VOWEL_RE.findall(word.lower()))
+
+
+def tokenize(input: str):
+    """
+    Split the input into words, i.e. runs of letters, digits, underscores and apostrophes.
+    """
+    # translating all delimiters to spaces and splitting on whitespace is a lot faster than a regex split.
+    # the translation table only covers ASCII, but other characters can't be part of a word anyway,
+    # so they are replaced with "?", which is a delimiter.
+    if not input.isascii():
+        input = input.encode("ascii", "replace").decode("ascii")
+    return input.translate(WORD_DELIMITER_TABLE).split()
+
+
+def count_words(input: str):
+    """
+    Count how often each word occurs in the input.
+    Returns a `Counter` mapping the words, in upper case, to their count.
+    """
+    # the input is upper-cased as a whole up front, instead of each word on its own.
+    return Counter(tokenize(input.upper()))
 
 
-def flesch_params(input: str):
+def count_sentences_and_words(input: str):
     """
-    Gather the necessary parameters (sentence, word and syllable count) for the Flesch-Kincaid readability tests.
+    Count the sentences in the input and how often each word occurs in it.
+    Returns a tuple of the sentence count and a `Counter` as returned by `count_words`.
     """
-    num_sentences = len(re.split(r"[\.?:!]+", input))
-    words = [word for word in REGEX_WORDS.split(input) if word != ""]
-    num_words = len(words)
-    num_syllables = sum([count_syllables(word) for word in words])
-    return (float(num_sentences), float(num_words), float(num_syllables))
+    # splitting at n delimiters yields n + 1 sentences.
+    num_sentences = len(SENTENCE_RE.findall(input)) + 1
+    return (num_sentences, count_words(input))
 
 
-def flesch_reading_ease(input: str):
+def get_total_word_count(words: Counter):
+    """
+    Get the total number of words in a `Counter` as returned by `count_words`.
     """
-    Calculate the Flesch reading ease score for the given input.
+    return sum(words.values())
+
+
+def get_total_syllable_count(words: Counter):
+    """
+    Get the total number of syllables of all words in a `Counter` as returned by `count_words`.
+    """
+    return sum(count_syllables(word) * count for (word, count) in words.items())
+
+
+def flesch_params(num_sentences: int, words: Counter):
+    """
+    Gather the necessary parameters (sentence, word and syllable count) for the Flesch-Kincaid readability tests
+    from a sentence count and a `Counter`, as returned by `count_sentences_and_words`.
+    """
+    return (num_sentences, get_total_word_count(words), get_total_syllable_count(words))
+
+
+def flesch_reading_ease(num_sentences: int, num_words: int, num_syllables: int):
+    """
+    Calculate the Flesch reading ease score from the parameters gathered by `flesch_params`.
     """
-    (num_sentences, num_words, num_syllables) = flesch_params(input)
     return (
         206.835
         - 1.015 * (num_words / num_sentences)
@@ -91,11 +213,10 @@ def flesch_reading_ease(input: str):
     )
 
 
-def flesch_kincaid_grade_level(input: str):
+def flesch_kincaid_grade_level(num_sentences: int, num_words: int, num_syllables: int):
     """
-    Calculate the Flesch-Kincaid grade level for the given input.
+    Calculate the Flesch-Kincaid grade level from the parameters gathered by `flesch_params`.
     """
-    (num_sentences, num_words, num_syllables) = flesch_params(input)
     return (
         0.39 * (float(num_words) / float(num_sentences))
         + 11.8 * (float(num_syllables) / float(num_words))
@@ -103,70 +224,89 @@ def flesch_kincaid_grade_level(input: str):
     )
 
 
-BORING_WORDS = [
-    "SO",
-    "I",
-    "I'M",
-    "IS",
-    "AND",
-    "NOT",
-    "THE",
-    "YOU",
-    "TOO",
-    "THIS",
-    "A",
-    "TO",
-    "WAS",
-    "THAT",
-    "IT",
-    "HAVE",
-    "ME",
-    "WITH",
-    "FOR",
-    "OF",
-    "BUT",
-    "S",
-    "MY",
-    "JUST",
-    "DO",
-    "IN",
-    "ON",
-    "LL",
-    "AS",
-    "ARE",
-    "T",
-    "RE",
-    "AT",
-    "THEN",
-    "BE",
-    "BY",
-    "WOULD",
-    "HAD",
-    "HAS",
-    "AN",
-]
-
-PRONOUNS = [
-    "YOU",
-    "YOUR",
-    "YOURS",
-    "HE",
-    "HIM",
-    "HIS",
-    "SHE",
-    "HER",
-    "HERS",
-    "IT",
-    "ITS",
-    "IT'S",
-    "WE",
-    "OUR",
-    "OURS",
-    "THEY",
-    "THEM",
-    "THEIRS",
-    "THAT'S",
-]
+BORING_WORDS = frozenset(
+    {
+        "SO",
+        "I",
+        "I'M",
+        "IS",
+        "AND",
+        "NOT",
+        "THE",
+        "YOU",
+        "TOO",
+        "THIS",
+        "A",
+        "TO",
+        "WAS",
+        "THAT",
+        "IT",
+        "HAVE",
+        "ME",
+        "WITH",
+        "FOR",
+        "OF",
+        "BUT",
+        "S",
+        "MY",
+        "JUST",
+        "DO",
+        "IN",
+        "ON",
+        "LL",
+        "AS",
+        "ARE",
+        "T",
+        "RE",
+        "AT",
+        "THEN",
+        "BE",
+        "BY",
+        "WOULD",
+        "HAD",
+        "HAS",
+        "AN",
+    }
+)
+
+PRONOUNS = frozenset(
+    {
+        "YOU",
+        "YOUR",
+        "YOURS",
+        "HE",
+        "HIM",
+        "HIS",
+        "SHE",
+        "HER",
+        "HERS",
+        "IT",
+        "ITS",
+        "IT'S",
+        "WE",
+        "OUR",
+        "OURS",
+        "THEY",
+        "THEM",
+        "THEIRS",
+        "THAT'S",
+    }
+)
+
+
+def exclude_words(
+    words: Counter, exclude_boring: bool = False, exclude_pronouns: bool = False
+):
+    """
+    Get a copy of a `Counter` as returned by `count_words`, without the words in `BORING_WORDS`
+    if `exclude_boring` is True and without the words in `PRONOUNS` if `exclude_pronouns` is True.
+    """
+    excluded = (BORING_WORDS if exclude_boring else frozenset()) | (
+        PRONOUNS if exclude_pronouns else frozenset()
+    )
+    return Counter(
+        {word: count for (word, count) in words.items() if word not in excluded}
+    )
 
 
 def get_words_with_count(
@@ -179,56 +319,31 @@ def get_words_with_count(
     Get all words in the input, in upper case.
     By default, return them as a list of (str, int) tuples with the word and its count,
     sorted by the count in descending order.
-    If `as_sorted` is set to false, return a dict mapping the words to their count.
-    """
-    split = REGEX_WORDS.split(input.upper())
-    words = {}
-    for word in split:
-        if exclude_boring and word in BORING_WORDS:
-            continue
-        elif exclude_pronouns and word in PRONOUNS:
-            continue
-        elif word in words:
-            words[word] = words[word] + 1
-        else:
-            words[word] = 1
+    If `as_sorted` is set to false, return a `Counter` mapping the words to their count.
+    """
+    words = exclude_words(count_words(input), exclude_boring, exclude_pronouns)
     if as_sorted:
-        return sorted(words.items(), key=lambda x: x[1], reverse=True)
+        return words.most_common()
     return words
 
 
-def get_most_used_words(input: str, exclude_pronouns: bool = False):
+def get_most_used_words(words: Counter, exclude_pronouns: bool = False):
     """
-    Get the 20 most used words as a list or (str, int) tuples with the word and its count,
-    excluding words in `BORING_WORDS`, from the input.
+    Get the 20 most used words in a `Counter` as returned by `count_words`
+    as a list of (str, int) tuples with the word and its count, excluding words in `BORING_WORDS`.
     If `exclude_pronouns` is True, also exclude the words in `PRONOUNS`.
+    `Counter.most_common` selects them with a bounded heap instead of sorting all words.
     """
-    words = get_words_with_count(
-        input, exclude_boring=True, exclude_pronouns=exclude_pronouns
-    )
-    return words[0:20]
-
-
-def get_total_word_count(input: str):
-    """
-    Get the total number of words in the input.
-    """
-    return len(REGEX_WORDS.split(input))
-
-
-def get_total_syllable_count(input: str):
-    """
-    Get the total number of syllables in the input.
-    """
-    words = REGEX_WORDS.split(input)
-    return sum([count_syllables(word) for word in words])
+    return exclude_words(
+        words, exclude_boring=True, exclude_pronouns=exclude_pronouns
+    ).most_common(20)
 
 
-def get_amount_of_i(input: str):
+def get_amount_of_i(words: Counter):
     """
-    Count how many times the speaker said "I".
+    Count how many times the speaker said "I", given a `Counter` as returned by `count_words`.
     """
-    return len([word for word in REGEX_WORDS.split(input) if word.upper() == "I"])
+    return words["I"]
 
 
 def get_words_with_deltas(input_a: str, input_b: str):
@@ -236,15 +351,12 @@ def get_words_with_deltas(input_a: str, input_b: str):
     Get the 20 words with the biggest difference between how often they occur in `input_a`
     as opposed to `input_b`.
     """
-    words_a = get_words_with_count(input_a)
+    words_a = get_words_with_count(input_a, as_sorted=False)
     words_b = get_words_with_count(input_b, as_sorted=False)
-
-    deltas = [
-        [word[0], word[1] - (words_b[word[0]] if word[0] in words_b else 0)]
-        for word in words_a
-    ]
-    deltas = sorted(deltas, key=lambda x: x[1], reverse=True)
-    return deltas[0:20]
+    # not using `words_a - words_b`, as that would drop words with negative deltas.
+    deltas = {word: count - words_b[word] for (word, count) in words_a.items()}
+    # words with the same delta are ordered by how often they occur in `input_a`.
+    return heapq.nlargest(20, deltas.items(), key=lambda x: (x[1], words_a[x[0]]))
 
 
 def get_zip_ratio(input: str):
@@ -252,46 +364,69 @@ def get_zip_ratio(input: str):
     return float(len(zlib.compress(input_bytes))) / float(len(input_bytes))
 
 
+SpeakerAnalysis = namedtuple(
+    "SpeakerAnalysis",
+    [
+        "num_words",
+        "num_syllables",
+        "zip_ratio",
+        "most_used_words",
+        "most_used_non_pronouns",
+        "amount_of_i",
+        "flesch_reading_ease",
+        "flesch_kincaid_grade_level",
+    ],
+)
+
+
+def analyze_speaker(input: str):
+    """
+    Run the whole analysis on everything a speaker said, returning a `SpeakerAnalysis`.
+    This tokenizes the input only once and passes the resulting word `Counter` to the `get_*` and `flesch_*` functions.
+    """
+    (num_sentences, words) = count_sentences_and_words(input)
+    params = flesch_params(num_sentences, words)
+    (_, num_words, num_syllables) = params
+    return SpeakerAnalysis(
+        num_words=num_words,
+        num_syllables=num_syllables,
+        zip_ratio=get_zip_ratio(input),
+        most_used_words=get_most_used_words(words),
+        most_used_non_pronouns=get_most_used_words(words, exclude_pronouns=True),
+        amount_of_i=get_amount_of_i(words),
+        flesch_reading_ease=flesch_reading_ease(*params),
+        flesch_kincaid_grade_level=flesch_kincaid_grade_level(*params),
+    )
+
+
 init_cmu_dict()
 
 # speakers = parse_file_to_speakers("debate_transcript.txt")
 speakers = parse_file_to_speakers("walz_vance_transcript")
 
-for speaker in speakers:
+for speaker, text in speakers.items():
+    analysis = analyze_speaker(text)
     print("===================================================================")
     print("Speaker: " + speaker)
-    print("Number of words said: " + str(get_total_word_count(speakers[speaker])))
-    print(
-        "Number of syllables said: " + str(get_total_syllable_count(speakers[speaker]))
-    )
-    print("gzip compression ratio: " + str(get_zip_ratio(speakers[speaker])))
-    most_used_words = get_most_used_words(speakers[speaker])
+    print("Number of words said: " + str(analysis.num_words))
+    print("Number of syllables said: " + str(analysis.num_syllables))
+    print("gzip compression ratio: " + str(analysis.zip_ratio))
     print(
         "Most used words: "
         + ", ".join(
-            [word[0] + "(" + str(word[1]) + " times)" for word in most_used_words]
+            f"{word}({count} times)" for (word, count) in analysis.most_used_words
         )
     )
-    most_used_non_pronouns = get_most_used_words(
-        speakers[speaker], exclude_pronouns=True
-    )
     print(
         "Most used non-pronoun words: "
         + ", ".join(
-            [
-                word[0] + "(" + str(word[1]) + " times)"
-                for word in most_used_non_pronouns
-            ]
+            f"{word}({count} times)"
+            for (word, count) in analysis.most_used_non_pronouns
         )
     )
-    print(
-        "Amount of times speaker said 'I': " + str(get_amount_of_i(speakers[speaker]))
-    )
-    print("Flesch Reading Ease: " + str(flesch_reading_ease(speakers[speaker])))
-    print(
-        "Flesch-Kincaid Grade Level: "
-        + str(flesch_kincaid_grade_level(speakers[speaker]))
-    )
+    print("Amount of times speaker said 'I': " + str(analysis.amount_of_i))
+    print("Flesch Reading Ease: " + str(analysis.flesch_reading_ease))
+    print("Flesch-Kincaid Grade Level: " + str(analysis.flesch_kincaid_grade_level))
 
 # everything from here on out will need to be changed for a different transcript!
 print("===================================================================")
@@ -301,10 +436,7 @@ biggest_delta_harris_trump = get_words_with_deltas(
 print(
     "Words (DEM CANDIDATE) said more often than (REP CANDIDATE): "
     + ", ".join(
-        [
-            word[0] + "(" + str(word[1]) + " times more)"
-            for word in biggest_delta_harris_trump
-        ]
+        f"{word}({count} times more)" for (word, count) in biggest_delta_harris_trump
     )
 )
 
@@ -314,9 +446,6 @@ biggest_delta_trump_harris = get_words_with_deltas(
 print(
     "Words (REP CANDIDATE) said more often than (DEM CANDIDATE): "
     + ", ".join(
-        [
-            word[0] + "(" + str(word[1]) + " times more)"
-            for word in biggest_delta_trump_harris
-        ]
+        f"{word}({count} times more)" for (word, count) in biggest_delta_trump_harris
     )
 )